@@ -5,33 +5,70 @@ from .transform import *
 from ..data_block import *
 from ..basic_data import *
 from ..layers import CrossEntropyFlat
-from concurrent.futures import ProcessPoolExecutor, as_completed
-
-__all__ = ['get_image_files', 'DatasetTfm', 'ImageDataset', 'ImageClassificationDataset', 'ImageMultiDataset', 'ObjectDetectDataset',
-           'SegmentationDataset', 'denormalize', 'get_annotations', 'ImageDataBunch', 'normalize',
-           'normalize_funcs', 'show_image_batch', 'show_images', 'show_xy_images', 'transform_datasets',
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from queue import Queue, Empty, Full
+from threading import Thread
+import weakref
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import PIL
+
+try: import lz4.frame
+except ImportError: lz4 = None
+
+#RE2 matches in linear time (DFA, no backtracking); fall back to stdlib re.
+try: import re2 as _re
+except ImportError: _re = re
+
+#orjson parses with SIMD, several times faster than stdlib json on big COCO files.
+try: import orjson; _json_loads = orjson.loads
+except ImportError: _json_loads = json.loads
+
+#GPU jpeg decode goes through torchvision's python API, which dispatches to the nvJPEG ops.
+try: from torchvision.io import decode_jpeg as _tv_decode_jpeg, ImageReadMode as _ImageReadMode
+except ImportError: _tv_decode_jpeg = None
+
+__all__ = ['get_image_files', 'DatasetTfm', 'ImageDataset', 'ImageBytesDataset', 'ImageClassificationDataset', 'ImageMultiDataset', 'ObjectDetectDataset',
+           'PrefetchDataLoader', 'PrefetchGenerator',
+           'SegmentationDataset', 'denormalize', 'get_annotations', 'ImageDataBunch', 'ImagePrefetcher', 'normalize',
+           'normalize_funcs', 'fast_collate', 'show_image_batch', 'show_images', 'show_xy_images', 'transform_datasets',
            'channel_view', 'cifar_stats', 'imagenet_stats', 'download_images', 'verify_images']
 
 image_extensions = set(k for k,v in mimetypes.types_map.items() if v.startswith('image/'))
+_image_extensions = frozenset(image_extensions)
+
+def _scan_files(root:PathOrStr, exts:frozenset, recurse:bool=False)->FilePathList:
+    "`os.scandir`-based scan of `root` filtering on lowercased suffix in `exts`, building `Path`s only for matches."
+    res,work = [],[os.fspath(root)]
+    while work:
+        with os.scandir(work.pop()) as it:
+            for entry in it:
+                name = entry.name
+                if name.startswith('.'): continue
+                if entry.is_dir(follow_symlinks=False):
+                    if recurse: work.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    dot = name.rfind('.')
+                    if dot != -1 and name[dot:].lower() in exts: res.append(entry.path)
+    return [Path(p) for p in res]
 
 def get_image_files(c:PathOrStr, check_ext:bool=True, recurse=False)->FilePathList:
     "Return list of files in `c` that are images. `check_ext` will filter to `image_extensions`."
-    return get_files(c, extensions=image_extensions)
+    if check_ext: return _scan_files(c, _image_extensions, recurse=recurse)
+    return get_files(c, recurse=recurse)
 
 def get_annotations(fname, prefix=None):
     "Open a COCO style json in `fname` and returns the lists of filenames (with `prefix`), bboxes and labels."
-    annot_dict = json.load(open(fname))
-    id2images, id2bboxes, id2cats = {}, collections.defaultdict(list), collections.defaultdict(list)
-    classes = {}
-    for o in annot_dict['categories']:
-        classes[o['id']] = o['name']
-    for o in annot_dict['annotations']:
-        bb = o['bbox']
-        id2bboxes[o['image_id']].append([bb[1],bb[0], bb[3]+bb[1], bb[2]+bb[0]])
-        id2cats[o['image_id']].append(classes[o['category_id']])
-    for o in annot_dict['images']:
-        if o['id'] in id2bboxes:
-            id2images[o['id']] = ifnone(prefix, '') + o['file_name']
+    with open(fname, 'rb') as f: annot_dict = _json_loads(f.read())
+    classes = {o['id']:o['name'] for o in annot_dict['categories']}
+    if not annot_dict['annotations']: return [],[],[]
+    ann = pd.DataFrame(annot_dict['annotations'])
+    bb = np.stack(ann['bbox'].values)
+    boxes = np.column_stack([bb[:,1], bb[:,0], bb[:,3]+bb[:,1], bb[:,2]+bb[:,0]]).tolist()
+    grouped = (pd.DataFrame({'image_id':ann['image_id'], 'box':boxes, 'cat':ann['category_id'].map(classes)})
+                 .groupby('image_id', sort=False).agg(list))
+    id2bboxes,id2cats = grouped['box'].to_dict(),grouped['cat'].to_dict()
+    id2images = {o['id']:ifnone(prefix, '') + o['file_name'] for o in annot_dict['images'] if o['id'] in id2bboxes}
     ids = list(id2images.keys())
     return [id2images[k] for k in ids], [id2bboxes[k] for k in ids], [id2cats[k] for k in ids]
 
@@ -63,27 +100,166 @@ def show_images(x:Collection[Image],y:int,rows:int, classes:Collection[str]=None
             ax.set_title(title)
     plt.tight_layout()
 
+class _PrefetchState():
+    "Queue+flag shared by a `PrefetchGenerator` and its producer thread; holds no reference back to the wrapper."
+    def __init__(self, generator:Iterator, num_prefetch_queue:int):
+        self.queue = Queue(maxsize=num_prefetch_queue)
+        self.generator = generator
+        self.closed = False
+
+    def _put(self, item)->bool:
+        "Blocking put that gives up once `closed` is set; True if `item` was enqueued."
+        while not self.closed:
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Full: pass
+        return False
+
+    def produce(self):
+        "Fill the queue; `None` signals exhaustion, exceptions are forwarded to the consumer."
+        try:
+            for item in self.generator:
+                if not self._put(item): return
+            self._put(None)
+        except Exception as e: self._put(e)
+
+    def close(self):
+        self.closed = True
+        while True:
+            try: self.queue.get_nowait()
+            except Empty: break
+
+class PrefetchGenerator():
+    "Consume `generator` in a daemon thread, buffering up to `num_prefetch_queue` (clamped to >=1) items in a `Queue`."
+    def __init__(self, generator:Iterator, num_prefetch_queue:int=3):
+        #The thread only references the state object, so dropping the wrapper (even mid-epoch)
+        #lets the finalizer close the state, unblock the producer and free the wrapped iterator.
+        self._state = _PrefetchState(generator, max(1, num_prefetch_queue))
+        self._finalize = weakref.finalize(self, self._state.close)
+        self.thread = Thread(target=self._state.produce, daemon=True)
+        self.thread.start()
+
+    def __next__(self):
+        state = self._state
+        if state.closed: raise StopIteration
+        item = state.queue.get()
+        if item is None or isinstance(item, Exception):
+            state.closed = True
+            if item is None: raise StopIteration
+            raise item
+        return item
+
+    def __iter__(self): return self
+
+    def close(self):
+        "Stop the producer thread, discarding anything it buffered."
+        self._finalize()
+
+class PrefetchDataLoader(DataLoader):
+    "`DataLoader` whose iterator is drained by a `PrefetchGenerator` thread so next-batch collation overlaps compute."
+    def __init__(self, *args, num_prefetch_queue:int=3, **kwargs):
+        self.num_prefetch_queue = num_prefetch_queue
+        super().__init__(*args, **kwargs)
+
+    def __iter__(self): return PrefetchGenerator(super().__iter__(), self.num_prefetch_queue)
+
 class ImageDataset(LabelDataset):
-    "Abstract `Dataset` containing images."
+    "Abstract `Dataset` containing images. `raw` items are `(H,W,3)` uint8 arrays for `fast_collate`."
+    def __init__(self, fns:FilePathList, y:np.ndarray, raw:bool=False, cache_dir:PathOrStr=None,
+                 cache_size:Tuple[int,int]=None):
+        #Fixed-width bytes array: one contiguous buffer, no per-path python object for workers to touch.
+        paths = [os.fsencode(p) for p in fns]
+        self.x = np.array(paths, dtype=f'|S{max(map(len, paths), default=1)}')
+        self.y = np.array(y)
+        self.raw,self.cache_dir,self.cache_size = raw,cache_dir,cache_size
+        if cache_dir is not None:
+            if lz4 is None: raise ImportError('lz4 is needed for the image cache: pip install lz4')
+            self.cache_dir = Path(cache_dir)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _open_cached(self, fn)->NPImage:
+        "uint8 `(H,W,3)` array for `fn`: jpeg-decode once, serve lz4-decompressed copies on later epochs."
+        key = hashlib.sha1(f'{fn}-{self.cache_size}'.encode()).hexdigest()
+        cfile = self.cache_dir/f'{key}.lz4'
+        if cfile.exists():
+            data = cfile.read_bytes()
+            h,w = np.frombuffer(data[:8], dtype=np.int32)
+            return np.frombuffer(lz4.frame.decompress(data[8:]), dtype=np.uint8).reshape(h,w,3)
+        arr = open_image_arr(fn)
+        if self.cache_size is not None:
+            arr = np.asarray(PIL.Image.fromarray(arr).resize(self.cache_size[::-1], PIL.Image.BILINEAR))
+        tmp = Path(f'{cfile}.{os.getpid()}')
+        tmp.write_bytes(np.asarray(arr.shape[:2], dtype=np.int32).tobytes()
+                        + lz4.frame.compress(np.ascontiguousarray(arr).tobytes()))
+        os.replace(tmp, cfile)
+        return arr
+
+    def __getitem__(self,i):
+        fn = os.fsdecode(self.x[i])
+        if self.cache_dir is not None:
+            arr = self._open_cached(fn)
+            if self.raw: return arr,self.y[i]
+            return Image(torch.from_numpy(arr).permute(2,0,1).float().div_(255)),self.y[i]
+        if self.raw: return open_image_arr(fn),self.y[i]
+        return open_image(fn),self.y[i]
+
+class ImageBytesDataset(LabelDataset):
+    "Like `ImageDataset` but keeps undecoded jpeg bytes, to be decoded on the GPU by `_nvjpeg_collate`."
     def __init__(self, fns:FilePathList, y:np.ndarray):
         self.x = np.array(fns)
         self.y = np.array(y)
 
-    def __getitem__(self,i): return open_image(self.x[i]),self.y[i]
+    def __getitem__(self,i): return torch.from_numpy(np.fromfile(self.x[i], dtype=np.uint8)),self.y[i]
+
+def _has_nvjpeg()->bool:
+    "True if torchvision can decode jpegs on the GPU, i.e. one of the nvJPEG ops is registered."
+    if _tv_decode_jpeg is None: return False
+    for op in ('decode_jpeg_cuda','decode_jpegs_cuda'):
+        try:
+            if getattr(torch.ops.image, op) is not None: return True
+        except (AttributeError, RuntimeError): pass
+    return False
+
+def _nvjpeg_collate(batch:ItemsList, device:torch.device=None)->Tuple[Tensor,Tensor]:
+    "Collate jpeg bytes into a `(N,3,H,W)` float batch, decoding with nvJPEG on a side cuda stream."
+    device = ifnone(device, defaults.device)
+    y = torch.tensor([b[1] for b in batch])
+    stream = torch.cuda.Stream(device)
+    with torch.cuda.stream(stream):
+        x = torch.stack([_tv_decode_jpeg(b[0], mode=_ImageReadMode.RGB, device=device)
+                         for b in batch]).float().div_(255)
+    torch.cuda.current_stream(device).wait_stream(stream)
+    x.record_stream(torch.cuda.current_stream(device))
+    return x,y
+
+def _jpeg_bytes_collate(batch:ItemsList)->Tensor:
+    "CPU fallback for `ImageBytesDataset`: decode the bytes in the workers then collate normally."
+    return data_collate([(open_image_from_bytes(x.numpy().tobytes()), y) for x,y in batch])
+
+def fast_collate(batch:ItemsList)->Tuple[Tensor,Tensor]:
+    "Collate `(H,W,3)` uint8 arrays into one preallocated uint8 `(N,3,H,W)` batch (see `ImageDataset` `raw` mode)."
+    y = torch.tensor([b[1] for b in batch], dtype=torch.int64)
+    h,w = batch[0][0].shape[:2]
+    x = torch.zeros(len(batch), 3, h, w, dtype=torch.uint8)
+    for i,(img,_) in enumerate(batch): x[i].copy_(torch.from_numpy(np.rollaxis(img, 2)))
+    return x,y
 
 class ImageClassificationDataset(ImageDataset):
     "`Dataset` for folders of images in style {folder}/{class}/{images}."
     def __init__(self, fns:FilePathList, labels:ImgLabels, classes:Optional[Collection[Any]]=None):
         self.classes = ifnone(classes, uniqueify(labels))
         self.class2idx = {v:k for k,v in enumerate(self.classes)}
-        y = np.array([self.class2idx[o] for o in labels], dtype=np.int64)
+        y = pd.Categorical(labels, categories=self.classes).codes.astype(np.int64)
+        if (y < 0).any():
+            raise KeyError(f'Labels not in classes: {uniqueify(o for o,c in zip(labels,y) if c < 0)}')
         super().__init__(fns, y)
         self.loss_func = F.cross_entropy
 
     @staticmethod
     def _folder_files(folder:Path, label:ImgLabel, extensions:Collection[str]=image_extensions)->Tuple[FilePathList,ImgLabels]:
         "From `folder` return image files and labels. The labels are all `label`. Only keep files with suffix in `extensions`."
-        fnames = get_files(folder, extensions=extensions)
+        fnames = _scan_files(folder, frozenset(e.lower() for e in extensions))
         return fnames,[label]*len(fnames)
 
     @classmethod
@@ -98,20 +274,36 @@ class ImageClassificationDataset(ImageDataset):
         "Dataset of `classes` labeled images in `folder`. Optional `valid_pct` split validation set."
         if classes is None: classes = [cls.name for cls in find_classes(folder)]
 
+        with ProcessPoolExecutor(max_workers=defaults.cpus) as ex:
+            chunksize = max(1, len(classes)//(4*defaults.cpus))
+            results = list(ex.map(partial(cls._folder_files, extensions=extensions),
+                                  [folder/cl for cl in classes], classes, chunksize=chunksize))
         fns,labels = [],[]
-        for cl in classes:
-            f,l = cls._folder_files(folder/cl, cl, extensions=extensions)
-            fns+=f; labels+=l
+        for f,l in results: fns+=f; labels+=l
 
         if valid_pct==0.: return cls(fns, labels, classes=classes)
         return [cls(*a, classes=classes) for a in random_split(valid_pct, fns, labels)]
 
+#Precompute the dense one-hot target table when it stays under this many bytes.
+_onehot_budget = 256 * 1024**2
+
 class ImageMultiDataset(LabelDataset):
     def __init__(self, fns:FilePathList, labels:ImgLabels, classes:Optional[Collection[Any]]=None):
         self.classes = ifnone(classes, uniqueify(np.concatenate(labels)))
         self.class2idx = {v:k for k,v in enumerate(self.classes)}
         self.x = np.array(fns)
-        self.y = [np.array([self.class2idx[o] for o in l], dtype=np.int64) for l in labels]
+        #Code all the labels in one Categorical pass, then split back per image.
+        if len(labels):
+            flat_labels = np.concatenate(labels)
+            flat = pd.Categorical(flat_labels, categories=self.classes).codes.astype(np.int64)
+            if (flat < 0).any():
+                raise KeyError(f'Labels not in classes: {uniqueify(flat_labels[flat < 0])}')
+            self.y = np.split(flat, np.cumsum([len(l) for l in labels])[:-1])
+        else: self.y = []
+        self._y_onehot = None
+        if len(fns) * len(self.classes) * 4 <= _onehot_budget:
+            self._y_onehot = np.zeros((len(fns), len(self.classes)), np.float32)
+            for i,idxs in enumerate(self.y): self._y_onehot[i,idxs] = 1.
         self.loss_func = F.binary_cross_entropy_with_logits
 
     def encode(self, x:Collection[int]):
@@ -121,7 +313,9 @@ class ImageMultiDataset(LabelDataset):
         return res
 
     def get_labels(self, idx:int)->ImgLabels: return [self.classes[i] for i in self.y[idx]]
-    def __getitem__(self,i:int)->Tuple[Image, np.ndarray]: return open_image(self.x[i]), self.encode(self.y[i])
+    def __getitem__(self,i:int)->Tuple[Image, np.ndarray]:
+        y = self._y_onehot[i] if self._y_onehot is not None else self.encode(self.y[i])
+        return open_image(self.x[i]), y
 
     @classmethod
     def from_single_folder(cls, folder:PathOrStr, classes:Collection[Any], extensions=image_extensions):
@@ -162,13 +356,19 @@ class ObjectDetectDataset(Dataset):
         for x in self.labels: self.classes = self.classes.union(set(x))
         self.classes = ['background'] + list(self.classes)
         self.class2idx = {v:k for k,v in enumerate(self.classes)}
+        #Pack the per-image boxes/labels into flat contiguous arrays + CSR-style offsets.
+        self._lab_flat = np.fromiter((self.class2idx[l] for labs in self.labels for l in labs), dtype=np.int64)
+        self._bb_flat = np.array([b for bbs in self.bbs for b in bbs], dtype=np.float32).reshape(-1,4)
+        self._offsets = np.cumsum([0]+[len(b) for b in self.bbs])
+        del self.bbs,self.labels
 
     def __repr__(self)->str: return f'{type(self).__name__} of len {len(self.x_fns)}'
     def __len__(self)->int: return len(self.x_fns)
     def __getitem__(self, i:int)->Tuple[Image,Tuple[ImageBBox, LongTensor]]:
         x = open_image(self.x_fns[i])
-        cats = LongTensor([self.class2idx[l] for l in self.labels[i]])
-        return x, (ImageBBox.create(self.bbs[i], *x.size, cats))
+        o1,o2 = self._offsets[i],self._offsets[i+1]
+        cats = torch.from_numpy(self._lab_flat[o1:o2])
+        return x, (ImageBBox.create(self._bb_flat[o1:o2], *x.size, cats))
 
     @classmethod
     def from_json(cls, folder, fname, valid_pct=None):
@@ -212,18 +412,26 @@ def transform_datasets(train_ds:Dataset, valid_ds:Dataset, test_ds:Optional[Data
     return res
 
 def normalize(x:TensorImage, mean:FloatTensor,std:FloatTensor)->TensorImage:
-    "Normalize `x` with `mean` and `std`."
-    return (x-mean[...,None,None]) / std[...,None,None]
+    "Normalize `x` with `mean` and `std` as a single fused multiply-add pass: `x/std - mean/std`."
+    inv_std = std.reciprocal()
+    return torch.addcmul((-mean*inv_std)[...,None,None], x, inv_std[...,None,None])
 
 def denormalize(x:TensorImage, mean:FloatTensor,std:FloatTensor)->TensorImage:
     "Denormalize `x` with `mean` and `std`."
     return x*std[...,None,None] + mean[...,None,None]
 
+def _normalize_batch_cpu(x:TensorImage, mean:FloatTensor, std:FloatTensor)->TensorImage:
+    "Normalize `x` in-place in ~256KB chunks so each chunk stays hot in L2 between the subtract and divide."
+    chunk = max(1, (256*1024)//(x[0].numel()*4))
+    for c in x.split(chunk, dim=0): c.sub_(mean[...,None,None]).div_(std[...,None,None])
+    return x
+
 def _normalize_batch(b:Tuple[Tensor,Tensor], mean:FloatTensor, std:FloatTensor, do_y:bool=False)->Tuple[Tensor,Tensor]:
     "`b` = `x`,`y` - normalize `x` array of imgs and `do_y` optionally `y`."
     x,y = b
     mean,std = mean.to(x.device),std.to(x.device)
-    x = normalize(x,mean,std)
+    if x.device.type=='cpu': x = _normalize_batch_cpu(x,mean,std)
+    else: x = normalize(x,mean,std)
     if do_y: y = normalize(y,mean,std)
     return x,y
 
@@ -233,6 +441,46 @@ def normalize_funcs(mean:FloatTensor, std:FloatTensor)->Tuple[Callable,Callable]
     return (partial(_normalize_batch, mean=mean, std=std),
             partial(denormalize,      mean=mean, std=std))
 
+class ImagePrefetcher():
+    "Wrap a `DeviceDataLoader` to copy batches to the GPU on a side cuda stream, fusing cast/normalize/layout in one pass."
+    def __init__(self, dl:DeviceDataLoader, mean:FloatTensor, std:FloatTensor):
+        self.dl,self.device = dl,dl.device
+        self.stream = torch.cuda.Stream(self.device)
+        mean,std = tensor(mean).to(self.device),tensor(std).to(self.device)
+        self.mean,self.std = mean.view(1,-1,1,1),std.view(1,-1,1,1)
+        self.mean255,self.std255 = self.mean*255,self.std*255
+
+    def __len__(self)->int: return len(self.dl)
+    def __getattr__(self,k:str)->Any: return getattr(self.dl, k)
+
+    def _process(self,x:Tensor)->Tensor:
+        "Fused HWC→CHW, uint8→float and normalize; uint8 input uses `255*mean`/`255*std` so the copy stays uint8."
+        if x.dim()==4 and x.size(-1)==3: x = x.permute(0,3,1,2)
+        if x.dtype==torch.uint8: return x.float().sub_(self.mean255).div_(self.std255)
+        return x.sub_(self.mean).div_(self.std)
+
+    def __iter__(self):
+        "Copy+normalize batch `k+1` on `self.stream` while batch `k` is being consumed."
+        cur,prev = torch.cuda.current_stream(self.device),None
+        for x,y in self.dl.dl:
+            with torch.cuda.stream(self.stream):
+                x = self._process(x.to(self.device, non_blocking=True))
+                y = y.to(self.device, non_blocking=True)
+                for f in listify(self.dl.tfms): x,y = f((x,y))
+            if prev is not None: yield prev
+            cur.wait_stream(self.stream)
+            if isinstance(x, Tensor): x.record_stream(cur)
+            if isinstance(y, Tensor): y.record_stream(cur)
+            prev = (x,y)
+        if prev is not None: yield prev
+
+    def one_batch(self)->Collection[Tensor]:
+        "Get one normalized batch, through the same path as `__iter__`."
+        w = self.dl.num_workers
+        self.dl.num_workers = 0
+        try:     return next(iter(self))
+        finally: self.dl.num_workers = w
+
 cifar_stats = ([0.491, 0.482, 0.447], [0.247, 0.243, 0.261])
 imagenet_stats = ([0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
 mnist_stats = ([0.15]*3, [0.15]*3)
@@ -243,7 +491,7 @@ def channel_view(x:Tensor)->Tensor:
 
 def _get_fns(ds, path):
     "List of all file names relative to `path`."
-    return [str(fn.relative_to(path)) for fn in ds.x]
+    return [str(Path(os.fsdecode(fn)).relative_to(path)) for fn in ds.x]
 
 def _df_to_fns_labels(df:pd.DataFrame, fn_col:int=0, label_col:int=1,
                       label_delim:str=None, suffix:Optional[str]=None):
@@ -259,12 +507,22 @@ class ImageDataBunch(DataBunch):
     @classmethod
     def create(cls, train_ds, valid_ds, test_ds=None, path:PathOrStr='.', bs:int=64, ds_tfms:Optional[TfmList]=None,
                      num_workers:int=defaults.cpus, tfms:Optional[Collection[Callable]]=None, device:torch.device=None,
-                     collate_fn:Callable=data_collate, size:int=None, **kwargs)->'ImageDataBunch':
+                     collate_fn:Callable=data_collate, size:int=None, prefetch_size:int=3, **kwargs)->'ImageDataBunch':
         "Factory method. `bs` batch size, `ds_tfms` for `Dataset`, `tfms` for `DataLoader`."
         datasets = [train_ds,valid_ds]
         if test_ds is not None: datasets.append(test_ds)
         if ds_tfms: datasets = transform_datasets(*datasets, tfms=ds_tfms, size=size, **kwargs)
-        dls = [DataLoader(*o, num_workers=num_workers) for o in
+        pin_memory = torch.cuda.is_available()
+        if isinstance(train_ds, ImageBytesDataset) and collate_fn is data_collate:
+            dev = ifnone(device, defaults.device)
+            if dev.type=='cuda' and _has_nvjpeg():
+                #CUDA can't be used in forked workers and the collated batches are already on
+                #the GPU, so the nvJPEG collate must run in the main process, unpinned.
+                collate_fn,num_workers,pin_memory = partial(_nvjpeg_collate, device=dev),0,False
+            else: collate_fn = _jpeg_bytes_collate
+        if collate_fn is data_collate and getattr(train_ds, 'raw', False): collate_fn = fast_collate
+        dls = [PrefetchDataLoader(*o, num_workers=num_workers, pin_memory=pin_memory,
+                                  num_prefetch_queue=prefetch_size) for o in
                zip(datasets, (bs,bs*2,bs*2), (True,False,False))]
         return cls(*dls, path=path, device=device, tfms=tfms, collate_fn=collate_fn)
 
@@ -328,23 +586,27 @@ class ImageDataBunch(DataBunch):
 
     @classmethod
     def from_name_re(cls, path:PathOrStr, fnames:FilePathList, pat:str, valid_pct:int=0.2, test:str=None, **kwargs):
-        pat = re.compile(pat)
-        def _get_label(fn): return pat.search(str(fn)).group(1)
-        return cls.from_name_func(path, fnames, _get_label, valid_pct=valid_pct, test=test, **kwargs)
+        pat = _re.compile(pat)
+        labels = [pat.search(n).group(1) for n in map(os.fspath, fnames)]
+        return cls.from_lists(path, fnames, labels, valid_pct=valid_pct, test=test, **kwargs)
 
     def batch_stats(self, funcs:Collection[Callable]=None)->Tensor:
         "Grab a batch of data and call reduction function `func` per channel"
         funcs = ifnone(funcs, [torch.mean,torch.std])
         x = self.valid_dl.one_batch()[0].cpu()
-        return [func(channel_view(x), 1) for func in funcs]
+        return [func(x, dim=(0,2,3)) for func in funcs]
 
-    def normalize(self, stats:Collection[Tensor]=None)->None:
-        "Add normalize transform using `stats` (defaults to `DataBunch.batch_stats`)"
+    def normalize(self, stats:Collection[Tensor]=None, do_prefetch:bool=False)->None:
+        "Add normalize transform using `stats` (defaults to `DataBunch.batch_stats`); `do_prefetch` normalizes on a side cuda stream instead."
         if getattr(self,'norm',False): raise Exception('Can not call normalize twice')
         if stats is None: self.stats = self.batch_stats()
         else:             self.stats = stats
         self.norm,self.denorm = normalize_funcs(*self.stats)
-        self.add_tfm(self.norm)
+        if do_prefetch and self.device.type=='cuda':
+            self.train_dl = ImagePrefetcher(self.train_dl, *self.stats)
+            self.valid_dl = ImagePrefetcher(self.valid_dl, *self.stats)
+            if self.test_dl: self.test_dl = ImagePrefetcher(self.test_dl, *self.stats)
+        else: self.add_tfm(self.norm)
         return self
 
     def show_batch(self:DataBunch, rows:int=None, figsize:Tuple[int,int]=(12,15), is_train:bool=True)->None:
@@ -368,22 +630,31 @@ class ImageDataBunch(DataBunch):
         return SplitDatasets.single_from_classes(path, classes).transform(**kwargs).databunch(bs=1)
 
 
-def download_image(url,dest):
-    try: r = download_url(url, dest, overwrite=True, show_progress=False)
+_dl_adapter = HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=Retry(3))
+_dl_session = requests.Session()
+_dl_session.mount('http://', _dl_adapter)
+_dl_session.mount('https://', _dl_adapter)
+
+def download_image(url,dest, timeout:int=10):
+    try:
+        r = _dl_session.get(url, timeout=timeout)
+        with open(dest, 'wb') as f: f.write(r.content)
     except Exception as e: print(f"Error {url} {e}")
 
-def download_images(urls:Collection[str], dest:PathOrStr, max_pics:int=1000):
+def download_images(urls:Collection[str], dest:PathOrStr, max_pics:int=1000, max_workers:int=64):
     "Download images listed in text file `urls` to path `dest`, at most `max_pics`"
     urls = open(urls).read().strip().split("\n")[:max_pics]
     dest = Path(dest)
     dest.mkdir(exist_ok=True)
-    with ProcessPoolExecutor(max_workers=8) as ex:
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
         futures = [ex.submit(download_image, url, dest/f"{i:08d}.jpg")
                    for i,url in enumerate(urls)]
         for f in progress_bar(as_completed(futures), total=len(urls)): pass
 
 def verify_image(file:Path, delete:bool):
-    try: assert open_image(file).shape[0]==3
+    "Check the header of `file` parses as a valid image, without paying for a full decode."
+    try:
+        with PIL.Image.open(file) as im: im.verify()
     except Exception as e:
         print(f'{e}')
         if delete: file.unlink()
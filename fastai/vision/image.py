@@ -6,7 +6,7 @@ import PIL
 
 __all__ = ['Image', 'ImageBBox', 'ImageSegment', 'ImagePoints', 'FlowField', 'RandTransform', 'TfmAffine', 'TfmCoord',
            'TfmCrop', 'TfmLighting', 'TfmPixel', 'Transform', 'apply_tfms', 'bb2hw', 'image2np', 'log_uniform',
-           'logit', 'logit_', 'open_image', 'open_mask', 'pil2tensor', 'rand_bool', 'scale_flow', 'show_image',
+           'logit', 'logit_', 'open_image', 'open_image_arr', 'open_image_from_bytes', 'open_mask', 'pil2tensor', 'rand_bool', 'scale_flow', 'show_image',
            'uniform', 'uniform_int', 'CoordFunc', 'TfmList']
 
 def logit(x:Tensor)->Tensor:
@@ -355,8 +355,35 @@ class ImageBBox(ImagePoints):
             else: text=None
             _draw_rect(ax, bb2hw(bbox), text=text, color=color)
 
+_JPEG_MAGIC = b'\xff\xd8'
+_jpeg_backend = os.environ.get('FASTAI_JPEG_BACKEND', 'turbojpeg')
+_turbo_jpeg = None
+if _jpeg_backend == 'turbojpeg':
+    try:
+        from turbojpeg import TurboJPEG, TJPF_RGB
+        _turbo_jpeg = TurboJPEG()
+    except Exception: _turbo_jpeg = None
+
+def open_image_from_bytes(data:bytes)->Image:
+    "Return `Image` object created from raw image `data`, using libjpeg-turbo for jpegs if available."
+    if _turbo_jpeg is not None and data[:2] == _JPEG_MAGIC:
+        arr = _turbo_jpeg.decode(data, pixel_format=TJPF_RGB)
+        return Image(torch.from_numpy(arr).permute(2,0,1).float().div_(255))
+    x = PIL.Image.open(BytesIO(data)).convert('RGB')
+    return Image(pil2tensor(x).float().div_(255))
+
+def open_image_arr(fn:PathOrStr)->NPImage:
+    "Decode image in `fn` to a `(H,W,3)` uint8 array - the raw decoder output, without the `Image` wrap."
+    if _turbo_jpeg is not None:
+        with open(fn, 'rb') as f: data = f.read()
+        if data[:2] == _JPEG_MAGIC: return _turbo_jpeg.decode(data, pixel_format=TJPF_RGB)
+        return np.asarray(PIL.Image.open(BytesIO(data)).convert('RGB'))
+    return np.asarray(PIL.Image.open(fn).convert('RGB'))
+
 def open_image(fn:PathOrStr)->Image:
-    "Return `Image` object created from image in file `fn`."
+    "Return `Image` object created from image in file `fn`, using libjpeg-turbo for jpegs if available."
+    if _turbo_jpeg is not None:
+        with open(fn, 'rb') as f: return open_image_from_bytes(f.read())
     x = PIL.Image.open(fn).convert('RGB')
     return Image(pil2tensor(x).float().div_(255))
 
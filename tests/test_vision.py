@@ -1,4 +1,6 @@
 import pytest
+import json
+import PIL
 from fastai import *
 from fastai.vision import *
 
@@ -40,3 +42,92 @@ def test_normalize(path):
     assert abs(x.std()-1) < abs(m-1)
 
     with pytest.raises(Exception): data.normalize()
+
+def _make_jpegs(path, n=4, size=(28,28)):
+    fns = []
+    for i in range(n):
+        fn = Path(path)/f'{i:02d}.jpg'
+        PIL.Image.new('RGB', size, color=(i*10, 0, 0)).save(fn)
+        fns.append(fn)
+    return fns
+
+def test_get_annotations(tmpdir):
+    coco = {'categories': [{'id':1,'name':'cat'},{'id':2,'name':'dog'}],
+            'annotations': [{'image_id':10,'bbox':[20,10,50,30],'category_id':1},
+                            {'image_id':11,'bbox':[0,0,10,10],'category_id':2},
+                            {'image_id':10,'bbox':[1,2,3,4],'category_id':2}],
+            'images': [{'id':11,'file_name':'b.jpg'},{'id':10,'file_name':'a.jpg'},{'id':12,'file_name':'c.jpg'}]}
+    fname = Path(tmpdir)/'annots.json'
+    fname.write_text(json.dumps(coco))
+    imgs,bbs,cats = get_annotations(fname, prefix='pre/')
+    assert imgs == ['pre/b.jpg','pre/a.jpg']
+    assert bbs == [[[0,0,10,10]], [[10,20,40,70],[2,1,6,4]]]
+    assert cats == [['dog'], ['cat','dog']]
+
+def test_get_image_files(tmpdir):
+    tmpdir = Path(tmpdir)
+    for n in ['a.jpg','b.PNG','c.txt','.hidden.jpg']: (tmpdir/n).touch()
+    (tmpdir/'sub').mkdir()
+    (tmpdir/'sub'/'d.jpeg').touch()
+    assert {f.name for f in get_image_files(tmpdir)} == {'a.jpg','b.PNG'}
+    assert {f.name for f in get_image_files(tmpdir, recurse=True)} == {'a.jpg','b.PNG','d.jpeg'}
+
+def test_fast_collate():
+    batch = [(np.full((8,8,3), i, dtype=np.uint8), i) for i in range(4)]
+    x,y = fast_collate(batch)
+    assert x.shape == (4,3,8,8) and x.dtype == torch.uint8
+    assert y.tolist() == [0,1,2,3]
+    assert (x[2] == 2).all()
+
+def test_prefetch_generator():
+    assert list(PrefetchGenerator(iter(range(10)))) == list(range(10))
+    def _boom():
+        yield 1
+        raise ValueError('broken batch')
+    it = PrefetchGenerator(_boom())
+    assert next(it) == 1
+    with pytest.raises(ValueError): next(it)
+
+def test_prefetch_generator_close_stops_producer():
+    it = PrefetchGenerator(iter(range(100)), num_prefetch_queue=2)
+    assert next(it) == 0
+    t = it.thread
+    it.close()
+    t.join(timeout=5)
+    assert not t.is_alive()
+
+def test_prefetch_generator_gc_stops_producer():
+    import gc
+    it = PrefetchGenerator(iter(range(100)), num_prefetch_queue=2)
+    assert next(it) == 0
+    t = it.thread
+    del it; gc.collect()
+    t.join(timeout=5)
+    assert not t.is_alive()
+
+def test_verify_image(tmpdir):
+    good,bad = Path(tmpdir)/'good.jpg',Path(tmpdir)/'bad.jpg'
+    PIL.Image.new('RGB', (8,8)).save(good)
+    bad.write_bytes(b'not an image')
+    verify_image(good, delete=True)
+    verify_image(bad, delete=True)
+    assert good.exists() and not bad.exists()
+
+def test_image_bytes_dataset_cpu_fallback(tmpdir):
+    from fastai.vision.data import _jpeg_bytes_collate
+    fns = _make_jpegs(tmpdir)
+    train_ds,valid_ds = ImageBytesDataset(fns, [0,1,0,1]),ImageBytesDataset(fns, [0,1,0,1])
+    data = ImageDataBunch.create(train_ds, valid_ds, bs=2, num_workers=0, device=torch.device('cpu'))
+    assert data.train_dl.collate_fn is _jpeg_bytes_collate
+    x,y = data.train_dl.one_batch()
+    assert x.shape == (2,3,28,28)
+
+def test_image_bytes_dataset_nvjpeg_dispatch(tmpdir, monkeypatch):
+    import fastai.vision.data as vdata
+    fns = _make_jpegs(tmpdir)
+    train_ds,valid_ds = ImageBytesDataset(fns, [0,1,0,1]),ImageBytesDataset(fns, [0,1,0,1])
+    monkeypatch.setattr(vdata, '_has_nvjpeg', lambda: True)
+    data = ImageDataBunch.create(train_ds, valid_ds, bs=2, device=torch.device('cuda'))
+    assert data.train_dl.collate_fn.func is vdata._nvjpeg_collate
+    assert data.train_dl.num_workers == 0
+    assert not data.train_dl.dl.pin_memory